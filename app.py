@@ -1,12 +1,19 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import hashlib
+import json
 import os
+import time
+
+import metrics
 
 # Import our route optimization functions
 from route_optimizer import (
     optimize_patient_route, 
-    calculate_total_route_distance, 
     compare_route_algorithms,
     get_algorithm_info
 )
@@ -28,6 +35,23 @@ print(f"📌 Database URL in use: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
 db = SQLAlchemy(app)
 
+# Count every statement sent to the database, per request and globally
+with app.app_context():
+    @event.listens_for(db.engine, "before_cursor_execute")
+    def count_db_query(conn, cursor, statement, parameters, context, executemany):
+        metrics.record_db_query()
+
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request(request.method, request.url_rule.rule if request.url_rule else "unmatched")
+
+
+@app.after_request
+def finish_request_metrics(response):
+    metrics.finish_request(response.status_code)
+    return response
+
 def migrate_add_route_order():
     """Add route_order column if it doesn't exist"""
     try:
@@ -52,14 +76,6 @@ def migrate_add_route_order():
         print(f"⚠️  Could not add route_order column: {e}")
         print("💡 This might be expected if the column already exists")
 
-# Ensure the database is created before handling requests
-with app.app_context():
-    db.create_all()
-    print("✅ Connected to PostgreSQL and initialized database!")
-    
-    # Automatically run migration
-    migrate_add_route_order()
-
 # Doctor locations - can be expanded or made configurable
 DOCTOR_LOCATIONS = {
     "office": {
@@ -95,42 +111,172 @@ class Patient(db.Model):
     route_order = db.Column(db.Integer, nullable=True)  # NEW COLUMN for optimization order
 
 
+class RoutePlan(db.Model):
+    """Materialized optimization result for one day, start location and patient set"""
+    __tablename__ = 'route_plans'
+    __table_args__ = (
+        db.UniqueConstraint('desired_day', 'start_location', 'fingerprint', name='uq_route_plans_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    desired_day = db.Column(db.String(20), nullable=False)
+    start_location = db.Column(db.String(50), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # Hash of the optimizer input
+    patient_ids = db.Column(db.Text, nullable=False)  # JSON list of patient ids in route order
+    total_distance = db.Column(db.Float, nullable=False)  # Round-trip km
+    algorithm = db.Column(db.String(50), nullable=False)
+    solve_time_ms = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @property
+    def ordered_ids(self):
+        return json.loads(self.patient_ids)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "desired_day": self.desired_day,
+            "start_location": self.start_location,
+            "fingerprint": self.fingerprint,
+            "patient_ids": self.ordered_ids,
+            "total_distance": f"{self.total_distance:.2f} km",
+            "algorithm": self.algorithm,
+            "solve_time_ms": round(self.solve_time_ms, 3),
+            "created_at": self.created_at.isoformat()
+        }
+
+
+# Ensure the database is created before handling requests (after all models are defined)
+with app.app_context():
+    db.create_all()
+    print("✅ Connected to PostgreSQL and initialized database!")
+    
+    # Automatically run migration
+    migrate_add_route_order()
+
+
+def route_fingerprint(patients, only_unseen=True):
+    """
+    Hash everything the optimizer reads from a day's patients.
+    Any added patient, moved address or seen toggle yields a new fingerprint.
+    """
+    rows = sorted((p.id, p.latitude, p.longitude, bool(p.seen)) for p in patients)
+    payload = json.dumps({"only_unseen": only_unseen, "patients": rows})
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def current_route_fingerprint(desired_day, only_unseen=True):
+    """Fingerprint a day straight from the optimizer input columns, without loading full rows"""
+    rows = db.session.query(
+        Patient.id, Patient.latitude, Patient.longitude, Patient.seen
+    ).filter_by(desired_day=desired_day).all()
+    return route_fingerprint(rows, only_unseen)
+
+
+def apply_route_order(all_patients, optimized_route):
+    """
+    Reset route_order for ALL patients on a day, numbering only the optimized (unseen) ones.
+    Returns True if any patient changed.
+    """
+    new_orders = {p.id: order for order, p in enumerate(optimized_route, start=1)}
+    changed = False
+    for patient in all_patients:
+        route_order = new_orders.get(patient.id)
+        if patient.route_order != route_order:
+            patient.route_order = route_order
+            changed = True
+    return changed
+
+
+def latest_route_plan(desired_day, start_location_key, fingerprint=None):
+    """Most recent stored plan for a day and start location (optionally for one exact input)"""
+    query = RoutePlan.query.filter_by(desired_day=desired_day, start_location=start_location_key)
+    if fingerprint is not None:
+        query = query.filter_by(fingerprint=fingerprint)
+    return query.order_by(RoutePlan.id.desc()).first()
+
+
 def optimize_route_for_day(desired_day, start_location_key="office", only_unseen=True):
     """
     Optimize route for all patients on a specific day and update their route_order
-    Now uses the imported optimization functions and focuses on unseen patients
+    Reuses the stored RoutePlan when the day's patients have not changed since it was solved
+
+    Returns:
+        Tuple of (patients in optimized order, RoutePlan) - ([], None) when there is nothing to route
     """
     try:
         start_location = DOCTOR_LOCATIONS[start_location_key]
         start_coords = (start_location["latitude"], start_location["longitude"])
         
-        # Get all patients for the specific day
-        all_patients = Patient.query.filter_by(desired_day=desired_day).all()
+        with metrics.phase("load"):
+            # Get all patients for the specific day
+            all_patients = Patient.query.filter_by(desired_day=desired_day).all()
 
-        if not all_patients:
-            return []
+            if not all_patients:
+                return [], None
 
-        # Use the imported optimization function (only unseen patients by default)
-        optimized_route = optimize_patient_route(all_patients, start_coords, desired_day, only_unseen)
+            fingerprint = route_fingerprint(all_patients, only_unseen)
+            route_plan = latest_route_plan(desired_day, start_location_key, fingerprint)
 
-        # Reset route_order for ALL patients on this day first
-        for patient in all_patients:
-            patient.route_order = None
+        metrics.record_cache(route_plan is not None)
 
-        # Update route_order only for the optimized (unseen) patients
-        route_order = 1
-        for patient in optimized_route:
-            patient.route_order = route_order
-            route_order += 1
-
-        # Commit changes to database
-        db.session.commit()
+        if route_plan is not None:
+            # Same input as a stored plan: skip the solver entirely
+            patients_by_id = {p.id: p for p in all_patients}
+            optimized_route = [patients_by_id[pid] for pid in route_plan.ordered_ids]
+        else:
+            # Use the imported optimization function (only unseen patients by default)
+            solve_started = time.perf_counter()
+            optimized_route, total_distance = optimize_patient_route(all_patients, start_coords, desired_day, only_unseen)
+            solve_time_ms = (time.perf_counter() - solve_started) * 1000
+
+            route_plan = RoutePlan(
+                desired_day=desired_day,
+                start_location=start_location_key,
+                fingerprint=fingerprint,
+                patient_ids=json.dumps([p.id for p in optimized_route]),
+                total_distance=total_distance,
+                algorithm=get_algorithm_info(len(optimized_route))["algorithm"],
+                solve_time_ms=solve_time_ms
+            )
+
+        with metrics.phase("persist"):
+            try:
+                changed = apply_route_order(all_patients, optimized_route)
+
+                if route_plan.id is None:
+                    db.session.add(route_plan)
+                    changed = True
+
+                # Commit changes to database (nothing to write on an up-to-date cache hit)
+                if changed:
+                    db.session.commit()
+
+            except IntegrityError:
+                # A concurrent request stored a plan for the same input first: adopt it
+                db.session.rollback()
+                route_plan = latest_route_plan(desired_day, start_location_key, fingerprint)
+                if route_plan is None:
+                    # The failure was not the plan key, so there is nothing to adopt
+                    raise
+                patients_by_id = {p.id: p for p in all_patients}
+                optimized_route = [patients_by_id[pid] for pid in route_plan.ordered_ids]
+
+                if apply_route_order(all_patients, optimized_route):
+                    db.session.commit()
         
-        return optimized_route
+        return optimized_route, route_plan
+
+    except IntegrityError as e:
+        # Surface constraint failures to the endpoint instead of reporting an empty route
+        db.session.rollback()
+        print(f"❌ Error optimizing route: {e}")
+        raise
 
     except Exception as e:
+        db.session.rollback()
         print(f"❌ Error optimizing route: {e}")
-        return []
+        return [], None
 
 
 # New endpoint to auto-optimize route when page loads
@@ -148,22 +294,17 @@ def auto_optimize():
             return jsonify({"error": "Invalid start_location"}), 400
 
         # Auto-optimize only unseen patients
-        optimized_patients = optimize_route_for_day(desired_day, start_location, only_unseen=True)
-        
-        # Calculate total distance for response
-        total_distance = 0
-        algorithm_info = get_algorithm_info(len(optimized_patients))
+        optimized_patients, route_plan = optimize_route_for_day(desired_day, start_location, only_unseen=True)
         
-        if optimized_patients:
-            start_coords = (DOCTOR_LOCATIONS[start_location]["latitude"], 
-                          DOCTOR_LOCATIONS[start_location]["longitude"])
-            total_distance = calculate_total_route_distance(optimized_patients, start_coords)
+        # Distance and algorithm come from the stored plan
+        total_distance = route_plan.total_distance if route_plan else 0
+        algorithm_used = route_plan.algorithm if route_plan else get_algorithm_info(0)["algorithm"]
         
         return jsonify({
             "message": f"Auto-optimized route for unseen patients on {desired_day}",
             "optimized_count": len(optimized_patients),
             "total_distance": f"{total_distance:.2f} km",
-            "algorithm_used": algorithm_info["algorithm"]
+            "algorithm_used": algorithm_used
         }), 200
 
     except Exception as e:
@@ -206,6 +347,11 @@ def home():
         return redirect(url_for('login'))
     return render_template('frontend.html')
 
+# Prometheus scrape endpoint for request, query and optimizer metrics
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # Get doctor locations
 @app.route('/api/doctor-locations', methods=['GET'])
 def get_doctor_locations():
@@ -243,13 +389,9 @@ def add_patient():
 
         # Automatically optimize route for this day (only unseen patients)
         start_location = data.get('start_location', DEFAULT_START_LOCATION)
-        optimized_patients = optimize_route_for_day(data['desired_day'], start_location, only_unseen=True)
+        optimized_patients, route_plan = optimize_route_for_day(data['desired_day'], start_location, only_unseen=True)
 
-        total_distance = 0
-        if optimized_patients:
-            start_coords = (DOCTOR_LOCATIONS[start_location]["latitude"], 
-                          DOCTOR_LOCATIONS[start_location]["longitude"])
-            total_distance = calculate_total_route_distance(optimized_patients, start_coords)
+        total_distance = route_plan.total_distance if route_plan else 0
 
         return jsonify({
             "message": "Patient added successfully and route auto-optimized",
@@ -276,23 +418,19 @@ def optimize_route_manual():
         if start_location not in DOCTOR_LOCATIONS:
             return jsonify({"error": "Invalid start_location"}), 400
 
-        optimized_patients = optimize_route_for_day(desired_day, start_location, only_unseen=True)
+        optimized_patients, route_plan = optimize_route_for_day(desired_day, start_location, only_unseen=True)
         
-        # Calculate total distance for response
-        total_distance = 0
+        # Distance and algorithm come from the stored plan
+        total_distance = route_plan.total_distance if route_plan else 0
         algorithm_info = get_algorithm_info(len(optimized_patients))
-        
-        if optimized_patients:
-            start_coords = (DOCTOR_LOCATIONS[start_location]["latitude"], 
-                          DOCTOR_LOCATIONS[start_location]["longitude"])
-            total_distance = calculate_total_route_distance(optimized_patients, start_coords)
+        algorithm_used = route_plan.algorithm if route_plan else algorithm_info["algorithm"]
         
         return jsonify({
             "message": f"Route optimized for {desired_day}",
             "optimized_count": len(optimized_patients),
             "start_location": DOCTOR_LOCATIONS[start_location]["name"],
             "total_distance": f"{total_distance:.2f} km",
-            "algorithm_used": algorithm_info["algorithm"],
+            "algorithm_used": algorithm_used,
             "algorithm_description": algorithm_info["description"]
         }), 200
 
@@ -338,6 +476,56 @@ def compare_routes():
         print(f"❌ Error comparing routes: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Fetch the stored route plan for a day without running the optimizer
+@app.route('/api/route-plan', methods=['GET'])
+def get_route_plan():
+    try:
+        desired_day = request.args.get('desired_day')
+        start_location = request.args.get('start_location', DEFAULT_START_LOCATION)
+
+        if not desired_day:
+            return jsonify({"error": "desired_day is required"}), 400
+
+        if start_location not in DOCTOR_LOCATIONS:
+            return jsonify({"error": "Invalid start_location"}), 400
+
+        # Prefer the plan solved for the day's current input, even if newer plans exist
+        route_plan = latest_route_plan(desired_day, start_location, current_route_fingerprint(desired_day))
+        stale = False
+        if not route_plan:
+            # No plan matches the current patients: fall back to the newest one, marked stale
+            route_plan = latest_route_plan(desired_day, start_location)
+            stale = True
+
+        if not route_plan:
+            return jsonify({"error": "No route plan found"}), 404
+
+        plan = route_plan.to_dict()
+        plan["stale"] = stale
+        return jsonify(plan), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Route plan history for analyzing route quality over time
+@app.route('/api/route-plans', methods=['GET'])
+def get_route_plans():
+    try:
+        desired_day = request.args.get('desired_day')
+        start_location = request.args.get('start_location')
+
+        query = RoutePlan.query
+        if desired_day:
+            query = query.filter_by(desired_day=desired_day)
+        if start_location:
+            query = query.filter_by(start_location=start_location)
+
+        route_plans = query.order_by(RoutePlan.id.desc()).all()
+        return jsonify([route_plan.to_dict() for route_plan in route_plans])
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Fetch patients for a specific day (now includes route_order)
 @app.route('/api/patients', methods=['GET'])
 def get_patients():
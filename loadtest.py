@@ -0,0 +1,416 @@
+"""
+HTTP Load Test Harness for medAIssit
+Seeds a local database with realistic days, drives the Flask API with concurrent
+simulated users and writes p50/p95/p99 latency, throughput and queries per request to JSON
+
+Usage:
+    python loadtest.py                                   # in-process server on a fresh SQLite file
+    python loadtest.py --users 20 --iterations 100
+    python loadtest.py --database-url postgresql://localhost/medaissit_load --allow-destructive-seed
+    python loadtest.py --url http://localhost:5000 --database-url <same DB as the server>
+    python loadtest.py --url http://localhost:5000 --no-seed     # reuse days seeded earlier
+    python loadtest.py --baseline previous_release.json  # fail on p95 regressions
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+
+
+# Seeded days start far in the future so they never overlap real working days
+SEED_START_DAY = date(2099, 1, 5)
+
+# Office coordinates, matching DOCTOR_LOCATIONS["office"] in app.py
+SEED_CENTER = (50.653662, 5.871008)
+SEED_RADIUS_DEGREES = 0.1  # Roughly 10 km around the office
+
+TIME_SLOTS = ["08:30", "09:00", "09:30", "10:00", "10:30", "11:00", "13:30", "14:00", "15:00", "16:00"]
+
+# Simulated user behaviour: (action, weight)
+SCENARIO = [
+    ("list_patients", 50),
+    ("auto_optimize", 25),
+    ("toggle_seen", 15),
+    ("add_patient", 10),
+]
+
+PERCENTILES = (50, 95, 99)
+
+
+# =====================================
+# DATABASE SEEDING
+# =====================================
+
+def build_days(day_count):
+    """Consecutive ISO dates from SEED_START_DAY, in the YYYY-MM-DD format the frontend sends"""
+    return [(SEED_START_DAY + timedelta(days=offset)).isoformat() for offset in range(day_count)]
+
+
+def random_patient_fields(rng, desired_day, index):
+    """Fields for one realistic patient: a few lack GPS, a few are already seen"""
+    has_gps = rng.random() > 0.1
+    return {
+        "name": f"Load Test Patient {index}",
+        "address": f"Rue de Test {index}, 4890 Thimister",
+        "latitude": SEED_CENTER[0] + rng.uniform(-SEED_RADIUS_DEGREES, SEED_RADIUS_DEGREES) if has_gps else None,
+        "longitude": SEED_CENTER[1] + rng.uniform(-SEED_RADIUS_DEGREES, SEED_RADIUS_DEGREES) if has_gps else None,
+        "desired_day": desired_day,
+        "desired_time": rng.choice(TIME_SLOTS),
+        "call_time": "",
+        "reason": "Load test visit",
+        "questions": "",
+        "phone": "",
+    }
+
+
+def seed_database(app_module, days, patients_per_day, rng):
+    """Replace every patient on the seeded days with freshly generated ones"""
+    Patient = app_module.Patient
+    RoutePlan = app_module.RoutePlan
+    db = app_module.db
+
+    with app_module.app.app_context():
+        Patient.query.filter(Patient.desired_day.in_(days)).delete(synchronize_session=False)
+        RoutePlan.query.filter(RoutePlan.desired_day.in_(days)).delete(synchronize_session=False)
+
+        index = 1
+        for desired_day in days:
+            for _ in range(patients_per_day):
+                patient = Patient(**random_patient_fields(rng, desired_day, index))
+                patient.seen = rng.random() < 0.2
+                db.session.add(patient)
+                index += 1
+
+        db.session.commit()
+        print(f"🌱 Seeded {index - 1} patients over {len(days)} days")
+
+
+# =====================================
+# METRICS SCRAPING
+# =====================================
+
+_DB_QUERY_SERIES = re.compile(
+    r'^medaissit_request_db_queries_(sum|count)\{endpoint="([^"]*)",method="([^"]*)"\} (\S+)$'
+)
+
+
+def scrape_db_queries(base_url):
+    """Read per-endpoint DB query totals from /metrics as {(method, endpoint): {"sum", "count"}}"""
+    response = requests.get(f"{base_url}/metrics", timeout=10)
+    response.raise_for_status()
+
+    totals = {}
+    for line in response.text.splitlines():
+        match = _DB_QUERY_SERIES.match(line)
+        if match:
+            kind, endpoint, method, value = match.groups()
+            totals.setdefault((method, endpoint), {"sum": 0.0, "count": 0.0})[kind] = float(value)
+    return totals
+
+
+# =====================================
+# SIMULATED USERS
+# =====================================
+
+class SimulatedUser(threading.Thread):
+    """One user clicking through the day views; records (action, latency, status) per request"""
+
+    def __init__(self, user_id, base_url, days, iterations, seed, start_event):
+        super().__init__(daemon=True)
+        self.user_id = user_id
+        self.base_url = base_url
+        self.days = days
+        self.iterations = iterations
+        self.rng = random.Random(seed + user_id)
+        self.start_event = start_event
+        self.session = requests.Session()
+        self.samples = []
+        self.known_ids = {}  # desired_day -> patient ids seen in the last listing
+
+    def run(self):
+        actions = [action for action, _ in SCENARIO]
+        weights = [weight for _, weight in SCENARIO]
+        self.start_event.wait()
+
+        for iteration in range(self.iterations):
+            action = self.rng.choices(actions, weights)[0]
+            desired_day = self.rng.choice(self.days)
+            getattr(self, action)(desired_day, iteration)
+
+    def _timed(self, action, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response = None
+            status = 0
+        latency = time.perf_counter() - started
+        self.samples.append((action, latency, status))
+        return response
+
+    def list_patients(self, desired_day, iteration):
+        response = self._timed("list_patients", "GET", "/api/patients",
+                               params={"desired_day": desired_day, "sort_by": "route_order"})
+        if response is not None and response.status_code == 200:
+            self.known_ids[desired_day] = [p["id"] for p in response.json()]
+
+    def auto_optimize(self, desired_day, iteration):
+        self._timed("auto_optimize", "POST", "/api/auto-optimize",
+                    json={"desired_day": desired_day, "start_location": "office"})
+
+    def toggle_seen(self, desired_day, iteration):
+        if not self.known_ids.get(desired_day):
+            # The frontend always lists a day before a patient can be ticked off. This fetch is
+            # setup, not a sampled action, so it stays out of the list_patients latencies
+            try:
+                response = self.session.get(f"{self.base_url}/api/patients", timeout=60,
+                                            params={"desired_day": desired_day})
+                if response.status_code == 200:
+                    self.known_ids[desired_day] = [p["id"] for p in response.json()]
+            except requests.RequestException:
+                pass
+        patient_ids = self.known_ids.get(desired_day)
+        if patient_ids:
+            patient_id = self.rng.choice(patient_ids)
+            self._timed("toggle_seen", "PUT", f"/api/patients/{patient_id}/seen")
+
+    def add_patient(self, desired_day, iteration):
+        index = 100000 + self.user_id * 10000 + iteration
+        self._timed("add_patient", "POST", "/api/patients",
+                    json=random_patient_fields(self.rng, desired_day, index))
+
+
+# Route rule each action lands on, as labelled by the metrics module
+ACTION_ENDPOINTS = {
+    "list_patients": ("GET", "/api/patients"),
+    "auto_optimize": ("POST", "/api/auto-optimize"),
+    "toggle_seen": ("PUT", "/api/patients/<int:patient_id>/seen"),
+    "add_patient": ("POST", "/api/patients"),
+}
+
+
+# =====================================
+# REPORTING
+# =====================================
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles, throughput and error count for one group of samples"""
+    latencies = sorted(latency * 1000 for _, latency, _ in samples)
+    errors = sum(1 for _, _, status in samples if status == 0 or status >= 400)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else None,
+        "latency_ms": {
+            f"p{pct}": round(percentile(latencies, pct), 3) if latencies else None
+            for pct in PERCENTILES
+        },
+    }
+    if latencies:
+        summary["latency_ms"]["mean"] = round(sum(latencies) / len(latencies), 3)
+        summary["latency_ms"]["max"] = round(latencies[-1], 3)
+    return summary
+
+
+def queries_per_request(before, after, method, endpoint):
+    start = before.get((method, endpoint), {"sum": 0.0, "count": 0.0})
+    end = after.get((method, endpoint), {"sum": 0.0, "count": 0.0})
+    count = end["count"] - start["count"]
+    return round((end["sum"] - start["sum"]) / count, 3) if count else None
+
+
+def build_report(args, samples, elapsed, queries_before, queries_after):
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "config": {
+            "users": args.users,
+            "iterations": args.iterations,
+            "days": args.days,
+            "patients_per_day": args.patients_per_day,
+            "seed": args.seed,
+            "target": args.url or "in-process",
+            "database": "postgresql" if args.database_url.startswith("postgres") else args.database_url.split(":")[0],
+        },
+        "duration_s": round(elapsed, 3),
+        "overall": summarize(samples, elapsed),
+        "endpoints": {},
+    }
+
+    for action, (method, endpoint) in ACTION_ENDPOINTS.items():
+        action_samples = [sample for sample in samples if sample[0] == action]
+        summary = summarize(action_samples, elapsed)
+        summary["endpoint"] = f"{method} {endpoint}"
+        if queries_before is not None:
+            summary["db_queries_per_request"] = queries_per_request(
+                queries_before, queries_after, method, endpoint)
+        report["endpoints"][action] = summary
+
+    return report
+
+
+def compare_with_baseline(report, baseline, max_regression):
+    """Print p95 deltas against a previous report; return the actions that regressed"""
+    regressions = []
+    print("\n📈 BASELINE COMPARISON (p95):")
+    for action, summary in report["endpoints"].items():
+        current = summary["latency_ms"]["p95"]
+        previous = baseline.get("endpoints", {}).get(action, {}).get("latency_ms", {}).get("p95")
+        if current is None or not previous:
+            print(f"{action}: no comparable data")
+            continue
+        change = (current - previous) / previous * 100
+        flag = ""
+        if change > max_regression:
+            regressions.append(action)
+            flag = " ❌"
+        print(f"{action}: {previous:.2f} ms -> {current:.2f} ms ({change:+.1f}%){flag}")
+    print("=" * 50)
+    return regressions
+
+
+def print_report(report):
+    overall = report["overall"]
+    print(f"\n📊 {overall['requests']} requests in {report['duration_s']:.2f}s "
+          f"({overall['throughput_rps']} req/s, {overall['errors']} errors)")
+    for action, summary in report["endpoints"].items():
+        latency = summary["latency_ms"]
+        if not summary["requests"]:
+            continue
+        line = (f"{action:<14} n={summary['requests']:<5} p50={latency['p50']:.1f}ms "
+                f"p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms")
+        if summary.get("db_queries_per_request") is not None:
+            line += f" queries/req={summary['db_queries_per_request']}"
+        print(line)
+
+
+# =====================================
+# ENTRY POINT
+# =====================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the medAIssit Flask API")
+    parser.add_argument("--url", help="Target an already running server instead of starting one in-process")
+    parser.add_argument("--database-url", help="Database to seed (default: a fresh SQLite file)")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=50, help="Actions per simulated user")
+    parser.add_argument("--days", type=int, default=5, help="Number of days to seed")
+    parser.add_argument("--patients-per-day", type=int, default=8, help="Patients seeded per day")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and user behaviour")
+    parser.add_argument("--no-seed", action="store_true", help="Skip seeding and use the existing days")
+    parser.add_argument("--allow-destructive-seed", action="store_true",
+                        help="Allow seeding a non-SQLite database (replaces all rows on the seeded days)")
+    parser.add_argument("--output", default="loadtest_results.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Previous JSON report to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Allowed p95 increase over the baseline, in percent")
+    parser.add_argument("--verbose", action="store_true", help="Keep the server's request logs and prints")
+    args = parser.parse_args(argv)
+
+    if args.url and not (args.database_url or args.no_seed):
+        parser.error("--url needs --database-url pointing at the server's database, "
+                     "or --no-seed to run against days it already has")
+
+    seeding_shared_database = (args.database_url and not args.database_url.startswith("sqlite")
+                               and not args.no_seed)
+    if seeding_shared_database and not args.allow_destructive_seed:
+        parser.error("seeding deletes every patient and route plan on the seeded days; "
+                     "pass --allow-destructive-seed to seed a non-SQLite database")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    if not args.database_url:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="medaissit-load-"), "loadtest.db")
+        # timeout lets SQLite writers wait on each other instead of failing with "database is locked"
+        args.database_url = f"sqlite:///{db_path}?timeout=30"
+
+    # app.py reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    import app as app_module
+
+    if not args.verbose:
+        import logging
+        logging.getLogger("medaissit.metrics").setLevel(logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    days = build_days(args.days)
+    if not args.no_seed:
+        seed_database(app_module, days, args.patients_per_day, rng)
+
+    server = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"🚀 {args.users} users x {args.iterations} actions against {base_url}")
+
+    try:
+        queries_before = scrape_db_queries(base_url)
+    except requests.RequestException as e:
+        print(f"⚠️  Could not read /metrics, queries per request will be omitted: {e}")
+        queries_before = None
+
+    start_event = threading.Event()
+    users = [SimulatedUser(user_id, base_url, days, args.iterations, args.seed, start_event)
+             for user_id in range(args.users)]
+    for user in users:
+        user.start()
+
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        started = time.perf_counter()
+        start_event.set()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - started
+    if quiet:
+        quiet.close()
+
+    queries_after = scrape_db_queries(base_url) if queries_before is not None else None
+    if server is not None:
+        server.shutdown()
+
+    samples = [sample for user in users for sample in user.samples]
+    report = build_report(args, samples, elapsed, queries_before, queries_after)
+    print_report(report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare_with_baseline(report, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Instrumentation Module for medAIssit
+Collects per-request and per-phase timings for the route optimizer and the API,
+renders them in Prometheus text format and emits one structured log line per request
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Structured request logs go to stderr through their own handler so the root logger
+# (configured by gunicorn or an embedding process) is left untouched
+logger = logging.getLogger("medaissit.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Opt-in profiling: set MEDAISSIT_PROFILE=1 to run every request under cProfile
+PROFILING_ENABLED = os.getenv("MEDAISSIT_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_TOP_N = int(os.getenv("MEDAISSIT_PROFILE_TOP", "15"))
+
+# Histogram buckets in seconds, shared by request and phase latencies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> {"bounds": (...), "buckets": [...], "sum": float, "count": int}
+_help = {
+    "medaissit_requests_total": ("counter", "HTTP requests handled"),
+    "medaissit_request_duration_seconds": ("histogram", "HTTP request latency"),
+    "medaissit_request_db_queries": ("histogram", "Database queries issued per request"),
+    "medaissit_db_queries_total": ("counter", "Database queries issued"),
+    "medaissit_optimizer_phase_duration_seconds": ("histogram", "Route optimizer phase latency"),
+    "medaissit_optimizer_runs_total": ("counter", "Route optimizer runs by algorithm"),
+    "medaissit_optimizer_patients": ("histogram", "Patients routed per optimizer run"),
+    "medaissit_optimizer_route_km": ("histogram", "Round-trip length of optimized routes"),
+    "medaissit_cache_requests_total": ("counter", "Route cache lookups by result"),
+}
+
+_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+_KM_BUCKETS = (5, 10, 25, 50, 75, 100, 150, 200, 300, 500)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def inc_counter(name, labels=None, value=1):
+    """Increment a counter by value"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, labels=None, buckets=LATENCY_BUCKETS):
+    """Record one observation in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"bounds": buckets, "buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(hist["bounds"]):
+            if value <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+# =====================================
+# PER-REQUEST CONTEXT
+# =====================================
+
+def start_request(method, endpoint):
+    """Begin collecting stats for the request handled by the current thread"""
+    _local.stats = {
+        "method": method,
+        "endpoint": endpoint,
+        "started": time.perf_counter(),
+        "db_queries": 0,
+        "phases": {},
+        "cache": None,
+        "optimizer": None,
+    }
+    _local.profiler = None
+    if PROFILING_ENABLED:
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+
+
+def current_request():
+    """Return the stats dict of the in-flight request, or None outside a request"""
+    return getattr(_local, "stats", None)
+
+
+def finish_request(status_code):
+    """Close the current request, record its metrics and emit a structured log line"""
+    stats = current_request()
+    if stats is None:
+        return None
+    _local.stats = None
+
+    duration = time.perf_counter() - stats["started"]
+    labels = {"method": stats["method"], "endpoint": stats["endpoint"], "status": str(status_code)}
+    inc_counter("medaissit_requests_total", labels)
+    observe("medaissit_request_duration_seconds", duration,
+            {"method": stats["method"], "endpoint": stats["endpoint"]})
+    observe("medaissit_request_db_queries", stats["db_queries"],
+            {"method": stats["method"], "endpoint": stats["endpoint"]}, buckets=_COUNT_BUCKETS)
+
+    record = {
+        "event": "request",
+        "method": stats["method"],
+        "endpoint": stats["endpoint"],
+        "status": status_code,
+        "duration_ms": round(duration * 1000, 3),
+        "db_queries": stats["db_queries"],
+    }
+    if stats["phases"]:
+        record["phases_ms"] = {k: round(v * 1000, 3) for k, v in stats["phases"].items()}
+    if stats["optimizer"]:
+        record.update(stats["optimizer"])
+    if stats["cache"] is not None:
+        record["cache"] = stats["cache"]
+
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _local.profiler = None
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        record["profile"] = buffer.getvalue()
+
+    logger.info(json.dumps(record))
+    return record
+
+
+def record_db_query():
+    """Count one database round-trip (hooked to SQLAlchemy cursor execution)"""
+    inc_counter("medaissit_db_queries_total")
+    stats = current_request()
+    if stats is not None:
+        stats["db_queries"] += 1
+
+
+def record_cache(hit):
+    """Count a route cache lookup as a hit or a miss"""
+    result = "hit" if hit else "miss"
+    inc_counter("medaissit_cache_requests_total", {"result": result})
+    stats = current_request()
+    if stats is not None:
+        stats["cache"] = result
+
+
+@contextmanager
+def phase(name):
+    """Time one optimizer phase (load, filter, construct, improve, persist)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("medaissit_optimizer_phase_duration_seconds", elapsed, {"phase": name})
+        stats = current_request()
+        if stats is not None:
+            stats["phases"][name] = stats["phases"].get(name, 0.0) + elapsed
+
+
+def record_optimization(algorithm, patient_count, total_distance):
+    """Record the outcome of one optimizer run"""
+    inc_counter("medaissit_optimizer_runs_total", {"algorithm": algorithm})
+    observe("medaissit_optimizer_patients", patient_count, buckets=_COUNT_BUCKETS)
+    observe("medaissit_optimizer_route_km", total_distance, buckets=_KM_BUCKETS)
+    stats = current_request()
+    if stats is not None:
+        stats["optimizer"] = {
+            "algorithm": algorithm,
+            "n": patient_count,
+            "route_km": round(total_distance, 3),
+        }
+
+
+# =====================================
+# PROMETHEUS TEXT EXPOSITION
+# =====================================
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def render_prometheus():
+    """Render every collected series in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: {"bounds": v["bounds"], "buckets": list(v["buckets"]),
+                          "sum": v["sum"], "count": v["count"]}
+                      for k, v in _histograms.items()}
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append(("counter", labels, value))
+    for (name, labels), hist in histograms.items():
+        by_name.setdefault(name, []).append(("histogram", labels, hist))
+
+    lines = []
+    for name in sorted(by_name):
+        metric_type, help_text = _help.get(name, (by_name[name][0][0], name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for kind, labels, value in sorted(by_name[name], key=lambda s: s[1]):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for bound, count in zip(value["bounds"], value["buckets"]):
+                bucket_labels = labels + (("le", _format_value(float(bound))),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{_format_labels(inf_labels)} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
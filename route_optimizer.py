@@ -6,6 +6,8 @@ Handles all route optimization algorithms including TSP solving and heuristics
 import itertools
 from math import radians, sin, cos, sqrt, atan2
 
+import metrics
+
 
 def haversine(lat1, lon1, lat2, lon2):
     """Calculate distance between two coordinates using Haversine formula"""
@@ -150,25 +152,26 @@ def optimize_patient_route(patients, start_location, desired_day=None, only_unse
         only_unseen: If True, only optimize routes for patients not yet seen
     
     Returns:
-        List of patients in optimized order
+        Tuple of (list of patients in optimized order, total round-trip distance in km)
     """
     if not patients:
-        return []
+        return [], 0
 
     # Filter patients with GPS coordinates and optionally only unseen patients
-    if only_unseen:
-        patients_with_gps = [p for p in patients 
-                           if p.latitude is not None and p.longitude is not None and not p.seen]
-        filter_msg = "unseen patients with GPS"
-    else:
-        patients_with_gps = [p for p in patients 
-                           if p.latitude is not None and p.longitude is not None]
-        filter_msg = "patients with GPS"
+    with metrics.phase("filter"):
+        if only_unseen:
+            patients_with_gps = [p for p in patients 
+                               if p.latitude is not None and p.longitude is not None and not p.seen]
+            filter_msg = "unseen patients with GPS"
+        else:
+            patients_with_gps = [p for p in patients 
+                               if p.latitude is not None and p.longitude is not None]
+            filter_msg = "patients with GPS"
     
     if not patients_with_gps:
         if desired_day:
             print(f"ℹ️  No {filter_msg} found for {desired_day}")
-        return []
+        return [], 0
 
     if desired_day:
         print(f"🚗 Optimizing route for {len(patients_with_gps)} {filter_msg} on {desired_day}")
@@ -178,21 +181,26 @@ def optimize_patient_route(patients, start_location, desired_day=None, only_unse
     # Choose optimization method based on number of patients
     if len(patients_with_gps) <= 8:
         print("🎯 Using exact TSP solver (≤8 patients)")
-        optimized_route = tsp_solver_small(patients_with_gps, start_location)
+        with metrics.phase("construct"):
+            optimized_route = tsp_solver_small(patients_with_gps, start_location)
     else:
         print("🧭 Using improved nearest neighbor heuristic (>8 patients)")
-        optimized_route = nearest_neighbor_with_return(patients_with_gps, start_location)
+        with metrics.phase("construct"):
+            optimized_route = nearest_neighbor_with_return(patients_with_gps, start_location)
         
         # Apply 2-opt improvement
         print("🔧 Applying 2-opt improvements...")
-        optimized_route = tsp_2opt_improvement(optimized_route, start_location)
+        with metrics.phase("improve"):
+            optimized_route = tsp_2opt_improvement(optimized_route, start_location)
 
     # Calculate and display route statistics
     total_distance = calculate_total_route_distance(optimized_route, start_location)
+    algorithm_info = get_algorithm_info(len(patients_with_gps))
+    metrics.record_optimization(algorithm_info["algorithm"], len(patients_with_gps), total_distance)
     print(f"📊 Total round-trip distance: {total_distance:.2f} km")
     print(f"✅ Route optimization completed!")
     
-    return optimized_route
+    return optimized_route, total_distance
 
 
 def compare_route_algorithms(patients, start_location):